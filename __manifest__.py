@@ -1,6 +1,6 @@
 {
     'name': 'WhatsApp Integration',
-    'version': '18.0.2.2.0',
+    'version': '18.0.2.3.0',
     'category': 'Discuss',
     'summary': 'WhatsApp Business API integration for Odoo Community',
     'description': """
@@ -24,11 +24,13 @@ Requirements:
     'depends': ['base', 'mail', 'contacts'],
     'data': [
         'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
         'wizard/whatsapp_send_wizard_views.xml',
         'views/whatsapp_account_views.xml',
         'views/whatsapp_conversation_views.xml',
         'views/whatsapp_message_views.xml',
         'views/whatsapp_template_views.xml',
+        'views/whatsapp_webhook_event_views.xml',
         'views/menus.xml',
     ],
     'assets': {
@@ -1,8 +1,7 @@
-import json
 import logging
 
 from odoo import http
-from odoo.http import request
+from odoo.http import Response, request
 
 _logger = logging.getLogger(__name__)
 
@@ -29,7 +28,7 @@ class WhatsAppWebhook(http.Controller):
         token = kwargs.get('hub.verify_token')
         challenge = kwargs.get('hub.challenge')
         
-        _logger.info(f"WhatsApp webhook verification: mode={mode}, token={token}")
+        _logger.debug("WhatsApp webhook verification: mode=%s, token=%s", mode, token)
         
         if mode == 'subscribe' and token:
             # Find account with matching verify token
@@ -52,69 +51,28 @@ class WhatsAppWebhook(http.Controller):
         """
         Handle incoming webhook notifications from WhatsApp.
         
-        Processes:
-        - Incoming messages
-        - Message status updates (sent, delivered, read)
+        The body must be signed (X-Hub-Signature-256) with the App Secret of
+        an active account. It is then queued as a whatsapp.webhook.event and
+        acknowledged right away, without even parsing it; messages and status
+        updates are processed by the webhook events cron, which is triggered
+        immediately.
         """
         try:
-            data = request.get_json_data()
-            _logger.info(f"WhatsApp webhook received: {json.dumps(data, indent=2)}")
-            
-            # Normalize data structure to handle both standard and flattened payloads
-            entries = data.get('entry', [])
+            body = request.httprequest.get_data()
+            signature = request.httprequest.headers.get('X-Hub-Signature-256')
+            if not request.env['whatsapp.account'].sudo()._verify_webhook_signature(body, signature):
+                _logger.warning("WhatsApp webhook rejected: invalid signature")
+                return 'Forbidden', 403
             
-            # If no 'entry' key, check if it looks like a flattened 'changes' object
-            if not entries and 'field' in data and 'value' in data:
-                 entries = [{'changes': [data]}]
+            payload = body.decode()
+            _logger.debug("WhatsApp webhook received: %s", payload)
             
-            # Process each entry
-            for entry in entries:
-                changes = entry.get('changes', [])
-                for change in changes:
-                    if change.get('field') != 'messages':
-                        continue
-                    
-                    value = change.get('value', {})
-                    metadata = value.get('metadata', {})
-                    phone_number_id = metadata.get('phone_number_id')
-                    
-                    if not phone_number_id:
-                        continue
-                    
-                    # Find the corresponding account
-                    account = request.env['whatsapp.account'].sudo().search([
-                        ('phone_number_id', '=', phone_number_id),
-                        ('active', '=', True)
-                    ], limit=1)
-                    
-                    if not account:
-                        _logger.warning(f"No account found for phone_number_id: {phone_number_id}")
-                        continue
-                    
-                    # Process messages
-                    messages = value.get('messages', [])
-                    contacts = value.get('contacts', [])
-                    
-                    for message in messages:
-                        contact = next((c for c in contacts if c.get('wa_id') == message.get('from')), {})
-                        msg_record = request.env['whatsapp.message'].sudo().process_webhook_message(
-                            account, message, contact
-                        )
-                        # Send bus notification for new message
-                        if msg_record:
-                            self._notify_new_message(account.id, msg_record)
-                    
-                    # Process status updates
-                    statuses = value.get('statuses', [])
-                    for status in statuses:
-                        msg_record = request.env['whatsapp.message'].sudo().process_status_update(
-                            account, status
-                        )
-                        # Send bus notification for status update
-                        if msg_record:
-                            self._notify_status_update(account.id, msg_record)
+            request.env['whatsapp.webhook.event'].sudo().create({
+                'payload': payload,
+            })
+            request.env.ref('whatsapp_integration.ir_cron_process_webhook_events').sudo()._trigger()
             
-            return 'OK'
+            return Response(b'{"status":"ok"}', content_type='application/json')
             
         except Exception as e:
             _logger.error(f"WhatsApp webhook error: {str(e)}", exc_info=True)
@@ -138,42 +96,3 @@ class WhatsAppWebhook(http.Controller):
             }
         except Exception as e:
             return {'status': 'error', 'message': str(e)}
-
-    def _notify_new_message(self, account_id, message):
-        """Send bus notification for new incoming message."""
-        try:
-            channel = f'whatsapp_channel_{account_id}'
-            notification = {
-                'type': 'new_message',
-                'account_id': account_id,
-                'conversation_id': message.conversation_id.id if message.conversation_id else None,
-                'message': {
-                    'id': message.id,
-                    'direction': message.direction,
-                    'content': message.content,
-                    'message_type': message.message_type,
-                    'timestamp': message.timestamp.isoformat() if message.timestamp else None,
-                    'status': message.status,
-                    'phone_number': message.phone_number,
-                }
-            }
-            request.env['bus.bus'].sudo()._sendone(channel, 'whatsapp.message', notification)
-            _logger.info(f"Bus notification sent for new message on channel: {channel}")
-        except Exception as e:
-            _logger.error(f"Failed to send bus notification: {e}")
-
-    def _notify_status_update(self, account_id, message):
-        """Send bus notification for message status update."""
-        try:
-            channel = f'whatsapp_channel_{account_id}'
-            notification = {
-                'type': 'status_update',
-                'account_id': account_id,
-                'message_id': message.id,
-                'whatsapp_message_id': message.whatsapp_message_id,
-                'status': message.status,
-                'error_message': message.error_message,
-            }
-            request.env['bus.bus'].sudo()._sendone(channel, 'whatsapp.status', notification)
-        except Exception as e:
-            _logger.error(f"Failed to send status bus notification: {e}")
@@ -0,0 +1,29 @@
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """
+    Clear duplicate WhatsApp message IDs before wa_msg_id_uniq is added.
+
+    Webhook retries used to store the same message several times. The
+    oldest row keeps the ID; the copies lose it, so that the unique
+    constraint (required by the ON CONFLICT insert of webhook messages)
+    can be created.
+    """
+    cr.execute("""
+        UPDATE whatsapp_message m
+           SET whatsapp_message_id = NULL
+          FROM (
+                SELECT whatsapp_message_id, MIN(id) AS keep_id
+                  FROM whatsapp_message
+                 WHERE whatsapp_message_id IS NOT NULL
+              GROUP BY whatsapp_message_id
+                HAVING COUNT(*) > 1
+               ) dup
+         WHERE m.whatsapp_message_id = dup.whatsapp_message_id
+           AND m.id <> dup.keep_id
+    """)
+    if cr.rowcount:
+        _logger.info("Cleared %s duplicate WhatsApp message IDs", cr.rowcount)
@@ -2,3 +2,5 @@ from . import whatsapp_account
 from . import whatsapp_conversation
 from . import whatsapp_message
 from . import whatsapp_template
+from . import whatsapp_webhook_event
+from . import res_partner
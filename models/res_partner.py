@@ -0,0 +1,20 @@
+from odoo import api, fields, models
+
+from .whatsapp_conversation import _phone_suffix
+
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+
+    phone_normalized = fields.Char(string='Normalized Phone',
+                                   compute='_compute_phone_normalized', store=True, index=True,
+                                   help='Last 10 digits of the phone, used to match WhatsApp numbers')
+    mobile_normalized = fields.Char(string='Normalized Mobile',
+                                    compute='_compute_phone_normalized', store=True, index=True,
+                                    help='Last 10 digits of the mobile, used to match WhatsApp numbers')
+
+    @api.depends('phone', 'mobile')
+    def _compute_phone_normalized(self):
+        for partner in self:
+            partner.phone_normalized = _phone_suffix(partner.phone) or False
+            partner.mobile_normalized = _phone_suffix(partner.mobile) or False
@@ -1,14 +1,51 @@
+import hashlib
+import hmac
 import json
 import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from odoo import api, fields, models
 from odoo.exceptions import UserError
+from odoo.tools import ormcache
 
 _logger = logging.getLogger(__name__)
 
 WHATSAPP_API_URL = "https://graph.facebook.com/v22.0"
 
+# Shared HTTP session so Graph API calls reuse pooled keep-alive connections
+# instead of paying a TCP+TLS handshake per request. Retry's default method
+# whitelist excludes POST, so sends are never replayed.
+_POOL_MAXSIZE = 50
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=_POOL_MAXSIZE,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
+
+def _post_message(url, headers, payload):
+    """
+    Post a message payload to the Graph API.
+    
+    Does not touch the ORM, so it is safe to call from worker threads.
+    
+    :return: tuple (whatsapp_message_id, error_message)
+    """
+    try:
+        response = _SESSION.post(url, headers=headers, json=payload, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        return data.get('messages', [{}])[0].get('id'), None
+    except requests.exceptions.RequestException as e:
+        return None, str(e)
+
 
 class WhatsAppAccount(models.Model):
     _name = 'whatsapp.account'
@@ -25,7 +62,7 @@ class WhatsAppAccount(models.Model):
     app_id = fields.Char(string='App ID',
                          help='Your Meta App ID')
     app_secret = fields.Char(string='App Secret',
-                             help='Your Meta App Secret')
+                             help='Your Meta App Secret, used to verify webhook signatures')
     verify_token = fields.Char(string='Webhook Verify Token', required=True,
                                help='Custom token for webhook verification (you define this)')
     
@@ -46,6 +83,61 @@ class WhatsAppAccount(models.Model):
          'This Phone Number ID is already registered!')
     ]
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        accounts = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return accounts
+
+    def write(self, vals):
+        if {'phone_number_id', 'app_secret', 'active'} & vals.keys():
+            self.env.registry.clear_cache()
+        return super().write(vals)
+
+    def unlink(self):
+        self.env.registry.clear_cache()
+        return super().unlink()
+
+    @api.model
+    @ormcache('phone_number_id')
+    def _get_id_by_phone_number_id(self, phone_number_id):
+        """Return the ID of the active account for a Phone Number ID (cached)."""
+        return self.sudo().search([
+            ('phone_number_id', '=', phone_number_id),
+            ('active', '=', True)
+        ], limit=1).id
+
+    @api.model
+    @ormcache()
+    def _get_app_secrets(self):
+        """Return the App Secrets of the active accounts (cached)."""
+        return tuple(self.sudo().search([
+            ('app_secret', '!=', False),
+            ('active', '=', True),
+        ]).mapped('app_secret'))
+
+    @api.model
+    def _verify_webhook_signature(self, body, signature):
+        """
+        Check the X-Hub-Signature-256 header of a webhook request.
+        
+        Meta signs the raw body with the App Secret (HMAC-SHA256); the body
+        is accepted if the signature matches the secret of an active account.
+        
+        :param body: Raw request body (bytes)
+        :param signature: Header value, as 'sha256=<hex digest>'
+        :return: True if the signature is valid
+        """
+        if not signature or not signature.startswith('sha256='):
+            return False
+        signature = signature[len('sha256='):]
+        return any(
+            hmac.compare_digest(
+                hmac.new(secret.encode(), body, hashlib.sha256).hexdigest(), signature
+            )
+            for secret in self._get_app_secrets()
+        )
+
     def _get_headers(self):
         """Get API headers with authorization."""
         self.ensure_one()
@@ -60,7 +152,7 @@ class WhatsAppAccount(models.Model):
         url = f"{WHATSAPP_API_URL}/{self.phone_number_id}"
         
         try:
-            response = requests.get(url, headers=self._get_headers(), timeout=30)
+            response = _SESSION.get(url, headers=self._get_headers(), timeout=30)
             response.raise_for_status()
             data = response.json()
             
@@ -91,7 +183,59 @@ class WhatsAppAccount(models.Model):
         self.ensure_one()
         url = f"{WHATSAPP_API_URL}/{self.phone_number_id}/messages"
         
-        payload = {
+        message_id, error = _post_message(
+            url, self._get_headers(), self._prepare_text_payload(to, message_text)
+        )
+        if error:
+            _logger.error(f"WhatsApp send failed: {error}")
+        
+        # Log the outgoing message
+        return self.env['whatsapp.message'].create(self._prepare_text_message_vals(
+            to, message_text, message_id, error, conversation_id
+        ))
+
+    def send_text_message_bulk(self, recipients):
+        """
+        Send text messages to several recipients concurrently.
+        
+        API calls run in a thread pool (size set by the
+        ``whatsapp.max_concurrency`` system parameter, 8 by default, at most
+        the HTTP connection pool size); the resulting messages are logged
+        afterwards with a single create().
+        
+        :param recipients: List of (phone_number, message_text) tuples
+        :return: whatsapp.message recordset, in recipient order
+        """
+        self.ensure_one()
+        if not recipients:
+            return self.env['whatsapp.message']
+        url = f"{WHATSAPP_API_URL}/{self.phone_number_id}/messages"
+        headers = self._get_headers()
+        payloads = [self._prepare_text_payload(to, text) for to, text in recipients]
+        try:
+            max_workers = int(self.env['ir.config_parameter'].sudo().get_param(
+                'whatsapp.max_concurrency', '8'
+            ))
+        except ValueError:
+            _logger.warning("Invalid whatsapp.max_concurrency parameter, using 8")
+            max_workers = 8
+        # More threads than pooled connections would only discard connections
+        max_workers = min(max(max_workers, 1), _POOL_MAXSIZE)
+        
+        # Worker threads only do HTTP; all ORM work stays on this thread
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(partial(_post_message, url, headers), payloads))
+        
+        vals_list = []
+        for (to, text), (message_id, error) in zip(recipients, results):
+            if error:
+                _logger.error(f"WhatsApp send to {to} failed: {error}")
+            vals_list.append(self._prepare_text_message_vals(to, text, message_id, error))
+        return self.env['whatsapp.message'].create(vals_list)
+
+    def _prepare_text_payload(self, to, message_text):
+        """Build the Graph API payload for a text message."""
+        return {
             "messaging_product": "whatsapp",
             "recipient_type": "individual",
             "to": to,
@@ -101,44 +245,22 @@ class WhatsAppAccount(models.Model):
                 "body": message_text
             }
         }
-        
-        try:
-            response = requests.post(url, headers=self._get_headers(), 
-                                     json=payload, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            
-            message_id = data.get('messages', [{}])[0].get('id')
-            
-            # Log the outgoing message
-            message = self.env['whatsapp.message'].create({
-                'account_id': self.id,
-                'conversation_id': conversation_id,
-                'direction': 'outgoing',
-                'phone_number': to,
-                'message_type': 'text',
-                'content': message_text,
-                'whatsapp_message_id': message_id,
-                'status': 'sent',
-            })
-            
-            return message
-            
-        except requests.exceptions.RequestException as e:
-            _logger.error(f"WhatsApp send failed: {str(e)}")
-            
-            # Log failed message
-            message = self.env['whatsapp.message'].create({
-                'account_id': self.id,
-                'conversation_id': conversation_id,
-                'direction': 'outgoing',
-                'phone_number': to,
-                'message_type': 'text',
-                'content': message_text,
-                'status': 'failed',
-                'error_message': str(e),
-            })
-            return message
+
+    def _prepare_text_message_vals(self, to, message_text, message_id, error, conversation_id=None):
+        """Build the whatsapp.message values logging an outgoing text message."""
+        vals = {
+            'account_id': self.id,
+            'conversation_id': conversation_id,
+            'direction': 'outgoing',
+            'phone_number': to,
+            'message_type': 'text',
+            'content': message_text,
+        }
+        if error:
+            vals.update(status='failed', error_message=error)
+        else:
+            vals.update(status='sent', whatsapp_message_id=message_id)
+        return vals
 
     def send_template_message(self, to, template_name, language_code='en', components=None, conversation_id=None):
         """
@@ -171,7 +293,7 @@ class WhatsAppAccount(models.Model):
             payload["template"]["components"] = components
         
         try:
-            response = requests.post(url, headers=self._get_headers(),
+            response = _SESSION.post(url, headers=self._get_headers(),
                                      json=payload, timeout=30)
             response.raise_for_status()
             data = response.json()
@@ -216,19 +338,26 @@ class WhatsAppAccount(models.Model):
         url = f"{WHATSAPP_API_URL}/{self.waba_id}/message_templates"
         
         try:
-            response = requests.get(url, headers=self._get_headers(), timeout=30)
+            response = _SESSION.get(url, headers=self._get_headers(), timeout=30)
             response.raise_for_status()
             data = response.json()
             
             templates = data.get('data', [])
             synced_count = 0
             
+            # Load all existing templates of the account at once
+            Template = self.env['whatsapp.template'].with_context(active_test=False)
+            synced_fnames = ['name', 'language', 'category', 'status', 'content']
+            existing = {
+                record['template_name']: record
+                for record in Template.search_read(
+                    [('account_id', '=', self.id)], ['template_name'] + synced_fnames
+                )
+            }
+            to_create = {}
+            to_update = {}
+            
             for template in templates:
-                existing = self.env['whatsapp.template'].search([
-                    ('account_id', '=', self.id),
-                    ('template_name', '=', template.get('name'))
-                ], limit=1)
-                
                 vals = {
                     'name': template.get('name', '').replace('_', ' ').title(),
                     'template_name': template.get('name'),
@@ -239,18 +368,30 @@ class WhatsAppAccount(models.Model):
                 }
                 
                 # Extract content from components
-                components = template.get('components', [])
-                for comp in components:
-                    if comp.get('type') == 'BODY':
-                        vals['content'] = comp.get('text', '')
-                        break
+                body = next((c for c in template.get('components', []) if c.get('type') == 'BODY'), None)
+                if body:
+                    vals['content'] = body.get('text', '')
                 
-                if existing:
-                    existing.write(vals)
+                record = existing.get(vals['template_name'])
+                if record:
+                    to_update[record['id']] = {
+                        fname: vals[fname] for fname in synced_fnames
+                        if fname in vals and vals[fname] != record[fname]
+                    }
                 else:
-                    self.env['whatsapp.template'].create(vals)
+                    to_create[vals['template_name']] = vals
                 synced_count += 1
             
+            if to_create:
+                Template.create(list(to_create.values()))
+            # Write only changed values, one UPDATE per distinct set of changes
+            ids_by_changes = defaultdict(list)
+            for template_id, changes in to_update.items():
+                if changes:
+                    ids_by_changes[tuple(sorted(changes.items()))].append(template_id)
+            for changes, template_ids in ids_by_changes.items():
+                Template.browse(template_ids).write(dict(changes))
+            
             return {
                 'type': 'ir.actions.client',
                 'tag': 'display_notification',
@@ -1,8 +1,19 @@
 import logging
+import re
+
+from psycopg2.extras import execute_values
+
 from odoo import api, fields, models
 
 _logger = logging.getLogger(__name__)
 
+_PHONE_STRIP_RE = re.compile(r'\D+')
+
+
+def _phone_suffix(phone):
+    """Return the last 10 digits of a phone number, used for partner matching."""
+    return _PHONE_STRIP_RE.sub('', phone or '')[-10:]
+
 
 class WhatsAppConversation(models.Model):
     _name = 'whatsapp.conversation'
@@ -35,48 +46,94 @@ class WhatsAppConversation(models.Model):
                                    store=True)
     
     display_name = fields.Char(string='Display Name', 
-                                compute='_compute_display_name')
+                                compute='_compute_display_name', store=True)
     
     _sql_constraints = [
         ('unique_phone_account', 'unique(phone_number, account_id)',
          'A conversation with this phone number already exists for this account.')
     ]
 
-    @api.depends('partner_id', 'phone_number')
+    @api.depends('partner_id.name', 'phone_number')
     def _compute_display_name(self):
         for record in self:
-            if record.partner_id:
-                record.display_name = record.partner_id.name
-            else:
-                record.display_name = record.phone_number
+            record.display_name = record.partner_id.name or record.phone_number
 
     @api.depends('phone_number')
     def _compute_partner_id(self):
         """Try to match phone number to a partner."""
+        partner_ids = self._match_partner_ids(self.mapped('phone_number'))
         for record in self:
-            phone = record.phone_number or ''
-            if not phone:
-                record.partner_id = False
-                continue
-            phone_short = phone[-10:] if len(phone) > 10 else phone
-            partner = self.env['res.partner'].search([
-                '|', '|',
-                ('phone', 'ilike', phone),
-                ('mobile', 'ilike', phone),
-                ('phone', 'ilike', phone_short),
-            ], limit=1)
-            record.partner_id = partner
+            record.partner_id = partner_ids.get(record.phone_number, False)
+
+    @api.model
+    def _match_partner_ids(self, phones):
+        """
+        Match phone numbers to partners with a single query.
+        
+        Partners are matched on the last 10 digits of their phone or mobile,
+        through the indexed res.partner phone_normalized and
+        mobile_normalized fields.
+        
+        :param phones: Iterable of phone numbers
+        :return: dict mapping each matched phone number to a res.partner ID
+        """
+        suffix_by_phone = {}
+        for phone in phones:
+            suffix = _phone_suffix(phone)
+            # Too few digits to identify anybody (e.g. short codes)
+            if len(suffix) >= 3:
+                suffix_by_phone[phone] = suffix
+        if not suffix_by_phone:
+            return {}
+        suffixes = list(set(suffix_by_phone.values()))
+        self.env['res.partner'].flush_model(['phone_normalized', 'mobile_normalized', 'active'])
+        self.env.cr.execute("""
+            SELECT phone_normalized, MIN(id), 0 AS priority
+              FROM res_partner
+             WHERE active AND phone_normalized = ANY(%s)
+          GROUP BY phone_normalized
+            UNION ALL
+            SELECT mobile_normalized, MIN(id), 1 AS priority
+              FROM res_partner
+             WHERE active AND mobile_normalized = ANY(%s)
+          GROUP BY mobile_normalized
+          ORDER BY priority
+        """, [suffixes, suffixes])
+        partner_by_suffix = {}
+        for suffix, partner_id, _priority in self.env.cr.fetchall():
+            # Phone matches come first and take precedence over mobile ones
+            partner_by_suffix.setdefault(suffix, partner_id)
+        return {
+            phone: partner_by_suffix[suffix]
+            for phone, suffix in suffix_by_phone.items()
+            if suffix in partner_by_suffix
+        }
 
     @api.depends('message_ids.timestamp', 'message_ids.content')
     def _compute_last_message(self):
+        # Fetch the latest message of every conversation in a single query
+        last_messages = {}
+        if self.ids:
+            self.env['whatsapp.message'].flush_model(['conversation_id', 'timestamp', 'content'])
+            # Only the preview prefix of the content leaves the database
+            self.env.cr.execute("""
+                SELECT DISTINCT ON (conversation_id) conversation_id, timestamp,
+                       LEFT(content, 50), LENGTH(content) > 50
+                  FROM whatsapp_message
+                 WHERE conversation_id = ANY(%s)
+              ORDER BY conversation_id, timestamp DESC, id DESC
+            """, [self.ids])
+            last_messages = {
+                conversation_id: (timestamp, preview, truncated)
+                for conversation_id, timestamp, preview, truncated in self.env.cr.fetchall()
+            }
         for record in self:
-            last_msg = self.env['whatsapp.message'].search([
-                ('conversation_id', '=', record.id)
-            ], order='timestamp desc', limit=1)
+            last_msg = last_messages.get(record.id)
             if last_msg:
-                record.last_message_date = last_msg.timestamp
-                preview = (last_msg.content or '')[:50]
-                if len(last_msg.content or '') > 50:
+                timestamp, preview, truncated = last_msg
+                record.last_message_date = timestamp
+                preview = preview or ''
+                if truncated:
                     preview += '...'
                 record.last_message_preview = preview
             else:
@@ -85,12 +142,14 @@ class WhatsAppConversation(models.Model):
 
     @api.depends('message_ids.status', 'message_ids.direction')
     def _compute_unread_count(self):
+        groups = self.env['whatsapp.message']._read_group([
+            ('conversation_id', 'in', self.ids),
+            ('direction', '=', 'incoming'),
+            ('status', '!=', 'read'),
+        ], ['conversation_id'], ['__count'])
+        counts = {conversation.id: count for conversation, count in groups}
         for record in self:
-            record.unread_count = self.env['whatsapp.message'].search_count([
-                ('conversation_id', '=', record.id),
-                ('direction', '=', 'incoming'),
-                ('status', '!=', 'read'),
-            ])
+            record.unread_count = counts.get(record.id, 0)
 
     @api.model
     def get_or_create(self, account_id, phone_number):
@@ -111,12 +170,56 @@ class WhatsAppConversation(models.Model):
         
         return conversation.id
 
+    @api.model
+    def _get_or_create_many(self, account_id, phone_numbers):
+        """
+        Get or create the conversations of several phone numbers at once.
+        
+        Existing conversations are read with one SELECT and the missing ones
+        inserted with one INSERT, bypassing the ORM; their stored computed
+        fields are scheduled as after a create(). A conversation created
+        concurrently by another transaction makes the INSERT raise a unique
+        violation, which webhook event processing retries.
+        
+        :param account_id: whatsapp.account ID
+        :param phone_numbers: Iterable of phone numbers (normalized here)
+        :return: dict mapping each given phone number to a conversation ID
+        """
+        normalized = {phone: self._normalize_phone(phone) for phone in phone_numbers}
+        phones = list(dict.fromkeys(normalized.values()))
+        self.flush_model(['account_id', 'phone_number'])
+        self.env.cr.execute("""
+            SELECT phone_number, id
+              FROM whatsapp_conversation
+             WHERE account_id = %s AND phone_number = ANY(%s)
+        """, [account_id, phones])
+        ids_by_phone = dict(self.env.cr.fetchall())
+        
+        missing = [phone for phone in phones if phone not in ids_by_phone]
+        if missing:
+            now = self.env.cr.now()
+            result = execute_values(self.env.cr._obj, """
+                INSERT INTO whatsapp_conversation (account_id, phone_number,
+                                                   create_date, write_date, create_uid, write_uid)
+                VALUES %s
+                RETURNING phone_number, id
+            """, [
+                (account_id, phone, now, now, self.env.uid, self.env.uid) for phone in missing
+            ], fetch=True)
+            ids_by_phone.update(result)
+            created = self.browse([conversation_id for _phone, conversation_id in result])
+            for field in self._fields.values():
+                if field.store and field.compute:
+                    self.env.add_to_compute(field, created)
+        
+        return {phone: ids_by_phone[normalized_phone] for phone, normalized_phone in normalized.items()}
+
     @api.model
     def _normalize_phone(self, phone):
-        """Normalize phone number by removing +, spaces, dashes."""
+        """Normalize phone number by keeping only its digits."""
         if not phone:
             return phone
-        return phone.replace('+', '').replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
+        return _PHONE_STRIP_RE.sub('', phone)
 
     def action_open_chat(self):
         """Open the chat interface for this conversation."""
@@ -129,25 +232,48 @@ class WhatsAppConversation(models.Model):
             }
         }
 
-    def get_messages(self, limit=50, offset=0):
-        """Get messages for this conversation, ordered oldest first for chat display."""
+    def get_messages(self, limit=50, before=None):
+        """
+        Get a page of messages for this conversation, ordered oldest first for chat display.
+        
+        Pages are fetched newest first with keyset pagination on
+        (timestamp, id), so loading older pages costs the same index seek
+        regardless of how far back the chat goes.
+        
+        :param limit: Maximum number of messages to return
+        :param before: ID of the oldest message already loaded; only older
+                       messages are returned
+        :return: dict with the ``messages`` and the ``next_before`` cursor to
+                 pass back for the previous page (None when there is none)
+        """
         self.ensure_one()
-        messages = self.env['whatsapp.message'].search([
-            ('conversation_id', '=', self.id)
-        ], order='timestamp asc', limit=limit, offset=offset)
+        domain = [('conversation_id', '=', self.id)]
+        if before:
+            cursor = self.env['whatsapp.message'].browse(before).exists()
+            if not cursor:
+                # The cursor message was deleted: there is no way to go further back
+                return {'messages': [], 'next_before': None}
+            domain += [
+                '|',
+                ('timestamp', '<', cursor.timestamp),
+                '&', ('timestamp', '=', cursor.timestamp), ('id', '<', cursor.id),
+            ]
+        messages = self.env['whatsapp.message'].search_read(
+            domain,
+            ['direction', 'content', 'message_type', 'timestamp', 'status', 'media_url'],
+            order='timestamp desc, id desc', limit=limit,
+        )
+        messages.reverse()
         
         # Mark incoming messages as read when viewing
         self.mark_as_read()
         
-        return [{
-            'id': msg.id,
-            'direction': msg.direction,
-            'content': msg.content,
-            'message_type': msg.message_type,
-            'timestamp': msg.timestamp.isoformat() if msg.timestamp else None,
-            'status': msg.status,
-            'media_url': msg.media_url,
-        } for msg in messages]
+        for msg in messages:
+            msg['timestamp'] = msg['timestamp'].isoformat() if msg['timestamp'] else None
+        return {
+            'messages': messages,
+            'next_before': messages[0]['id'] if len(messages) == limit else None,
+        }
 
     def mark_as_read(self):
         """Mark all incoming messages in this conversation as read."""
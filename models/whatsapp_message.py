@@ -1,8 +1,36 @@
+import json
 import logging
+from collections import defaultdict
+
+from psycopg2.extras import execute_values
+
 from odoo import api, fields, models
 
 _logger = logging.getLogger(__name__)
 
+# Columns written by _insert_raw(), i.e. the keys of webhook message values
+_RAW_INSERT_COLUMNS = (
+    'account_id', 'conversation_id', 'direction', 'phone_number', 'message_type',
+    'content', 'media_url', 'whatsapp_message_id', 'status', 'timestamp',
+)
+
+# Message statuses reported by status webhooks that are applied as-is
+_WEBHOOK_STATUSES = frozenset(('sent', 'delivered', 'read', 'failed'))
+
+# Webhook message type -> function building (content, media_url) from the
+# type-specific part of the message (e.g. message['image'])
+_WEBHOOK_CONTENT_HANDLERS = {
+    'text': lambda data: (data.get('body', ''), None),
+    'image': lambda data: (data.get('caption', '[Image]'), data.get('id')),
+    'document': lambda data: (data.get('filename', '[Document]'), data.get('id')),
+    'audio': lambda data: ('[Audio Message]', data.get('id')),
+    'video': lambda data: (data.get('caption', '[Video]'), data.get('id')),
+    'location': lambda data: (
+        f"📍 {data.get('name', '')} ({data.get('latitude')}, {data.get('longitude')})", None
+    ),
+    'reaction': lambda data: (f"Reaction: {data.get('emoji', '')}", None),
+}
+
 
 class WhatsAppMessage(models.Model):
     _name = 'whatsapp.message'
@@ -13,8 +41,9 @@ class WhatsAppMessage(models.Model):
     account_id = fields.Many2one('whatsapp.account', string='WhatsApp Account',
                                   required=True, ondelete='cascade')
     
+    # Indexed through whatsapp_message_conv_ts_idx, see init()
     conversation_id = fields.Many2one('whatsapp.conversation', string='Conversation',
-                                       ondelete='cascade', index=True)
+                                       ondelete='cascade')
     
     direction = fields.Selection([
         ('incoming', 'Incoming'),
@@ -42,7 +71,8 @@ class WhatsAppMessage(models.Model):
     media_url = fields.Char(string='Media URL', help='URL for media messages')
     media_mime_type = fields.Char(string='Media MIME Type')
     
-    whatsapp_message_id = fields.Char(string='WhatsApp Message ID', index=True,
+    # Indexed through the wa_msg_id_uniq constraint, see init()
+    whatsapp_message_id = fields.Char(string='WhatsApp Message ID',
                                        help='Message ID from WhatsApp API')
     
     status = fields.Selection([
@@ -51,7 +81,7 @@ class WhatsAppMessage(models.Model):
         ('delivered', 'Delivered'),
         ('read', 'Read'),
         ('failed', 'Failed'),
-    ], string='Status', default='pending')
+    ], string='Status', default='pending', index='btree_not_null')
     
     error_message = fields.Text(string='Error Message')
     
@@ -61,32 +91,84 @@ class WhatsAppMessage(models.Model):
     
     timestamp = fields.Datetime(string='Timestamp', default=fields.Datetime.now, index=True)
     
-    display_name = fields.Char(string='Display Name', compute='_compute_display_name')
+    display_name = fields.Char(string='Display Name', compute='_compute_display_name', store=True)
+    
+    _sql_constraints = [
+        ('wa_msg_id_uniq', 'unique(whatsapp_message_id)',
+         'This WhatsApp message has already been recorded!')
+    ]
     
+    def init(self):
+        # Status lookups by WhatsApp message ID rely on the wa_msg_id_uniq
+        # index; keep a plain index only if the constraint could not be added
+        self.env.cr.execute("""
+            SELECT 1 FROM pg_constraint
+             WHERE conname = 'whatsapp_message_wa_msg_id_uniq'
+        """)
+        if self.env.cr.fetchone():
+            self.env.cr.execute("""
+                DROP INDEX IF EXISTS whatsapp_message__whatsapp_message_id_index
+            """)
+        else:
+            _logger.warning("Constraint whatsapp_message_wa_msg_id_uniq is missing, "
+                            "duplicate WhatsApp message IDs must be removed")
+            self.env.cr.execute("""
+                CREATE INDEX IF NOT EXISTS whatsapp_message__whatsapp_message_id_index
+                    ON whatsapp_message (whatsapp_message_id)
+            """)
+        # Serves the "latest message per conversation" lookups and chat paging,
+        # as well as any lookup by conversation_id, which replaces a
+        # single-column index; direction, with only two values, gets no index
+        # of its own
+        self.env.cr.execute("""
+            DROP INDEX IF EXISTS whatsapp_message__conversation_id_index,
+                                 whatsapp_message__direction_index
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS whatsapp_message_conv_ts_idx
+                ON whatsapp_message (conversation_id, timestamp DESC)
+        """)
+        # Small partial index covering only the unread incoming messages; the
+        # predicate matches the ORM's SQL for ('status', '!=', 'read'), which
+        # also accepts NULL
+        self.env.cr.execute("""
+            DROP INDEX IF EXISTS whatsapp_message_conv_dir_status_idx
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS whatsapp_message_conv_unread_idx
+                ON whatsapp_message (conversation_id)
+             WHERE direction = 'incoming' AND (status != 'read' OR status IS NULL)
+        """)
+        # Serves per-account message lists in the default _order, as well as
+        # any lookup by account_id, which replaces a single-column index
+        self.env.cr.execute("""
+            DROP INDEX IF EXISTS whatsapp_message__account_id_index
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS whatsapp_message_account_ts_idx
+                ON whatsapp_message (account_id, timestamp DESC)
+        """)
+
     @api.depends('phone_number', 'content', 'message_type')
     def _compute_display_name(self):
         for record in self:
-            preview = (record.content or '')[:30]
-            if len(record.content or '') > 30:
-                preview += '...'
+            content = record.content or ''
+            preview = content[:30] + ('...' if len(content) > 30 else '')
             record.display_name = f"{record.phone_number}: {preview}"
 
-    @api.depends('phone_number')
+    @api.depends('phone_number', 'conversation_id.partner_id')
     def _compute_partner_id(self):
         """Try to match phone number to a partner."""
-        for record in self:
-            phone = record.phone_number or ''
-            if not phone:
-                record.partner_id = False
-                continue
-            phone_short = phone[-10:] if len(phone) > 10 else phone
-            partner = self.env['res.partner'].search([
-                '|', '|',
-                ('phone', 'ilike', phone),
-                ('mobile', 'ilike', phone),
-                ('phone', 'ilike', phone_short),
-            ], limit=1)
-            record.partner_id = partner
+        # Messages share the contact of their conversation; only match the others
+        linked = self.filtered('conversation_id')
+        for record in linked:
+            record.partner_id = record.conversation_id.partner_id
+        unlinked = self - linked
+        partner_ids = self.env['whatsapp.conversation']._match_partner_ids(
+            unlinked.mapped('phone_number')
+        )
+        for record in unlinked:
+            record.partner_id = partner_ids.get(record.phone_number, False)
 
     def action_open_partner(self):
         """Open the linked partner form."""
@@ -115,48 +197,98 @@ class WhatsAppMessage(models.Model):
         }
 
     @api.model
-    def process_webhook_message(self, account, message_data, contact_data):
+    def process_webhook_messages(self, account, messages, contacts):
         """
-        Process an incoming message from webhook.
+        Process a batch of incoming messages from a webhook change.
+        
+        All messages are inserted with a single multi-row INSERT.
+        
+        :param account: whatsapp.account record
+        :param messages: List of message dicts from webhook payload
+        :param contacts: List of contact dicts from webhook payload
+        :return: whatsapp.message recordset of the new (non-duplicate) messages
+        """
+        contacts_by_wa = {c['wa_id']: c for c in contacts if c.get('wa_id')}
+        phones = [
+            contacts_by_wa.get(message_data.get('from'), {}).get('wa_id', message_data.get('from', ''))
+            for message_data in messages
+        ]
+        if not phones:
+            return self.browse()
+        
+        # Get or create the conversations of all senders at once
+        conversation_ids = self.env['whatsapp.conversation']._get_or_create_many(
+            account.id, phones
+        )
+        
+        # All messages of a webhook share the same receipt time
+        now = fields.Datetime.now()
+        vals_list = [
+            self._prepare_webhook_message_vals(
+                account, message_data, phone, conversation_ids[phone], now
+            )
+            for message_data, phone in zip(messages, phones)
+        ]
+        return self._insert_raw(vals_list)
+
+    @api.model
+    def _insert_raw(self, vals_list):
+        """
+        Insert trusted webhook messages with one INSERT, bypassing the ORM.
+        
+        Values are neither validated nor completed with defaults, so only use
+        this for webhook ingestion. Stored computed fields of the new messages
+        and of their conversations are recomputed as after a regular create().
+        
+        Messages whose WhatsApp ID is already recorded (webhook retries from
+        Meta) are skipped and left out of the result.
+        
+        :param vals_list: List of dicts keyed by _RAW_INSERT_COLUMNS
+        :return: whatsapp.message recordset of the newly inserted messages
+        """
+        if not vals_list:
+            return self.browse()
+        now = self.env.cr.now()
+        rows = [
+            tuple(vals[column] for column in _RAW_INSERT_COLUMNS) + (now, now, self.env.uid, self.env.uid)
+            for vals in vals_list
+        ]
+        result = execute_values(self.env.cr._obj, f"""
+            INSERT INTO whatsapp_message ({', '.join(_RAW_INSERT_COLUMNS)},
+                                          create_date, write_date, create_uid, write_uid)
+            VALUES %s
+            ON CONFLICT (whatsapp_message_id) DO NOTHING
+            RETURNING id
+        """, rows, fetch=True)
+        messages = self.browse([row[0] for row in result])
+        
+        # Schedule what the ORM would have recomputed on create()
+        for field in self._fields.values():
+            if field.store and field.compute:
+                self.env.add_to_compute(field, messages)
+        self.env['whatsapp.conversation'].invalidate_model(['message_ids'])
+        messages.modified(_RAW_INSERT_COLUMNS, create=True)
+        return messages
+
+    @api.model
+    def _prepare_webhook_message_vals(self, account, message_data, phone, conversation_id, timestamp):
+        """
+        Build the values of an incoming webhook message.
         
         :param account: whatsapp.account record
         :param message_data: Message dict from webhook payload
-        :param contact_data: Contact dict from webhook payload
+        :param phone: Sender phone number
+        :param conversation_id: whatsapp.conversation ID of the sender
+        :param timestamp: Receipt datetime of the message
         """
         message_type = message_data.get('type', 'text')
-        content = ''
-        media_url = None
-        
-        if message_type == 'text':
-            content = message_data.get('text', {}).get('body', '')
-        elif message_type == 'image':
-            content = message_data.get('image', {}).get('caption', '[Image]')
-            media_url = message_data.get('image', {}).get('id')
-        elif message_type == 'document':
-            content = message_data.get('document', {}).get('filename', '[Document]')
-            media_url = message_data.get('document', {}).get('id')
-        elif message_type == 'audio':
-            content = '[Audio Message]'
-            media_url = message_data.get('audio', {}).get('id')
-        elif message_type == 'video':
-            content = message_data.get('video', {}).get('caption', '[Video]')
-            media_url = message_data.get('video', {}).get('id')
-        elif message_type == 'location':
-            loc = message_data.get('location', {})
-            content = f"📍 {loc.get('name', '')} ({loc.get('latitude')}, {loc.get('longitude')})"
-        elif message_type == 'reaction':
-            content = f"Reaction: {message_data.get('reaction', {}).get('emoji', '')}"
+        handler = _WEBHOOK_CONTENT_HANDLERS.get(message_type)
+        if handler:
+            content, media_url = handler(message_data.get(message_type, {}))
         else:
-            content = f'[{message_type.title()} message]'
+            content, media_url = f'[{message_type.title()} message]', None
         
-        phone = contact_data.get('wa_id', message_data.get('from', ''))
-        
-        # Get or create conversation for this phone number (returns ID)
-        conversation_id = self.env['whatsapp.conversation'].get_or_create(
-            account.id, phone
-        )
-        
-        return self.create({
+        return {
             'account_id': account.id,
             'conversation_id': conversation_id,
             'direction': 'incoming',
@@ -166,45 +298,97 @@ class WhatsAppMessage(models.Model):
             'media_url': media_url,
             'whatsapp_message_id': message_data.get('id'),
             'status': 'delivered',
-            'timestamp': fields.Datetime.now(),
-        })
+            'timestamp': timestamp,
+        }
 
     @api.model
-    def process_status_update(self, account, status_data):
+    def process_status_updates(self, account, statuses):
         """
-        Update message status from webhook.
+        Update message statuses from a webhook change.
+        
+        Updates are grouped by new status so that each group costs a single
+        UPDATE; when a message is reported several times, its last status wins.
         
         :param account: whatsapp.account record
-        :param status_data: Status dict from webhook payload
+        :param statuses: List of status dicts from webhook payload
+        :return: whatsapp.message recordset of the updated messages
         """
-        message_id = status_data.get('id')
-        status = status_data.get('status')
-        
-        if not message_id or not status:
-            return False
-        
-        message = self.search([
-            ('whatsapp_message_id', '=', message_id),
-            ('account_id', '=', account.id),
-        ], limit=1)
-        
-        if message:
-            status_map = {
-                'sent': 'sent',
-                'delivered': 'delivered',
-                'read': 'read',
-                'failed': 'failed',
-            }
-            new_status = status_map.get(status)
-            if new_status:
-                message.status = new_status
-                if status == 'failed':
-                    errors = status_data.get('errors', [])
-                    if errors:
-                        error_obj = errors[0]
-                        # Try 'error_data.details', then 'message', then 'title', then dump
-                        error_details = error_obj.get('error_data', {}).get('details')
-                        error_msg = error_details or error_obj.get('message') or error_obj.get('title') or str(error_obj)
-                        message.error_message = error_msg
-        
-        return message
+        latest = {}
+        for status_data in statuses:
+            if status_data.get('id') and status_data.get('status') in _WEBHOOK_STATUSES:
+                latest[status_data['id']] = status_data
+        
+        ids_by_status = defaultdict(list)
+        for message_id, status_data in latest.items():
+            ids_by_status[status_data['status']].append(message_id)
+        
+        updated = self.browse()
+        for status, message_ids in ids_by_status.items():
+            if status == 'failed':
+                updated |= self._set_failed_statuses(account, {
+                    message_id: self._get_webhook_error_message(latest[message_id])
+                    for message_id in message_ids
+                })
+                continue
+            updated |= self._set_statuses(account, status, message_ids)
+        return updated
+
+    @api.model
+    def _set_statuses(self, account, status, message_ids):
+        """
+        Set the same status on several messages, in one UPDATE.
+        
+        :param account: whatsapp.account record
+        :param status: New status of the messages
+        :param message_ids: List of WhatsApp message IDs
+        :return: whatsapp.message recordset of the updated messages
+        """
+        self.flush_model(['status'])
+        self.env.cr.execute("""
+            UPDATE whatsapp_message
+               SET status = %s,
+                   write_date = NOW() AT TIME ZONE 'UTC',
+                   write_uid = %s
+             WHERE whatsapp_message_id = ANY(%s) AND account_id = %s
+         RETURNING id
+        """, [status, self.env.uid, message_ids, account.id])
+        messages = self.browse([row[0] for row in self.env.cr.fetchall()])
+        messages.invalidate_recordset(['status', 'write_date', 'write_uid'])
+        messages.modified(['status'])
+        return messages
+
+    @api.model
+    def _set_failed_statuses(self, account, errors):
+        """
+        Mark messages as failed along with their own error, in one UPDATE.
+        
+        :param account: whatsapp.account record
+        :param errors: dict mapping WhatsApp message IDs to an error message
+                       (None keeps the current one)
+        :return: whatsapp.message recordset of the updated messages
+        """
+        self.flush_model(['status', 'error_message'])
+        self.env.cr.execute("""
+            UPDATE whatsapp_message
+               SET status = 'failed',
+                   error_message = COALESCE(%s::jsonb ->> whatsapp_message_id, error_message),
+                   write_date = NOW() AT TIME ZONE 'UTC',
+                   write_uid = %s
+             WHERE whatsapp_message_id = ANY(%s) AND account_id = %s
+         RETURNING id
+        """, [json.dumps(errors), self.env.uid, list(errors), account.id])
+        messages = self.browse([row[0] for row in self.env.cr.fetchall()])
+        messages.invalidate_recordset(['status', 'error_message', 'write_date', 'write_uid'])
+        messages.modified(['status', 'error_message'])
+        return messages
+
+    @api.model
+    def _get_webhook_error_message(self, status_data):
+        """Extract a readable error from a failed status webhook, if any."""
+        errors = status_data.get('errors', [])
+        if not errors:
+            return None
+        error_obj = errors[0]
+        # Try 'error_data.details', then 'message', then 'title', then dump
+        error_details = error_obj.get('error_data', {}).get('details')
+        return error_details or error_obj.get('message') or error_obj.get('title') or str(error_obj)
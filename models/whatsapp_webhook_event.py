@@ -0,0 +1,290 @@
+import logging
+import threading
+from collections import defaultdict, deque
+from datetime import timedelta
+from functools import partial
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    from json import loads as _loads
+
+from psycopg2 import errors
+
+from odoo import SUPERUSER_ID, api, fields, models
+from odoo.modules.registry import Registry
+
+_logger = logging.getLogger(__name__)
+
+# Bus notifications waiting to be sent by the dispatcher thread, as
+# (dbname, (channel, type, payload)) tuples
+_BUS_QUEUE = deque()
+_BUS_COND = threading.Condition()
+_BUS_BATCH_SIZE = 200
+_bus_thread = None
+
+# Transient errors caused by concurrent transactions (e.g. the chat UI
+# marking a conversation as read, or creating the conversation a webhook
+# message belongs to): the conflicting event stays queued for the next
+# cron run, while the events processed before it are committed
+_CONCURRENCY_ERRORS = (
+    errors.LockNotAvailable,
+    errors.SerializationFailure,
+    errors.DeadlockDetected,
+    errors.UniqueViolation,
+)
+
+
+def _bus_dispatcher():
+    """Send queued bus notifications with a dedicated cursor, forever."""
+    while True:
+        with _BUS_COND:
+            _BUS_COND.wait_for(lambda: _BUS_QUEUE)
+            batch = [_BUS_QUEUE.popleft() for _ in range(min(len(_BUS_QUEUE), _BUS_BATCH_SIZE))]
+
+        notifications_by_db = defaultdict(list)
+        for dbname, notification in batch:
+            notifications_by_db[dbname].append(notification)
+
+        for dbname, notifications in notifications_by_db.items():
+            try:
+                with Registry(dbname).cursor() as cr:
+                    bus = api.Environment(cr, SUPERUSER_ID, {})['bus.bus']
+                    for channel, notification_type, notification in notifications:
+                        bus._sendone(channel, notification_type, notification)
+            except Exception as e:
+                _logger.error(f"Failed to send bus notifications: {e}")
+
+
+def _enqueue_bus_notifications(dbname, notifications):
+    """Hand notifications over to the dispatcher thread, starting it if needed."""
+    global _bus_thread
+    with _BUS_COND:
+        if _bus_thread is None or not _bus_thread.is_alive():
+            _bus_thread = threading.Thread(
+                target=_bus_dispatcher, name='whatsapp.bus.dispatcher', daemon=True
+            )
+            _bus_thread.start()
+        _BUS_QUEUE.extend((dbname, notification) for notification in notifications)
+        _BUS_COND.notify()
+
+
+class WhatsAppWebhookEvent(models.Model):
+    _name = 'whatsapp.webhook.event'
+    _description = 'WhatsApp Webhook Event'
+    _order = 'id desc'
+
+    payload = fields.Text(string='Payload', required=True,
+                          help='Raw JSON body received from the WhatsApp webhook')
+
+    state = fields.Selection([
+        ('new', 'New'),
+        ('done', 'Done'),
+        ('error', 'Error'),
+    ], string='Status', default='new', required=True, index=True)
+
+    error_message = fields.Text(string='Error Message')
+
+    def action_retry(self):
+        """Queue failed events for processing again."""
+        self.write({'state': 'new', 'error_message': False})
+        self.env.ref('whatsapp_integration.ir_cron_process_webhook_events')._trigger()
+
+    @api.model
+    def _cron_process_events(self, limit=500, batch_size=50):
+        """
+        Process queued webhook events.
+
+        Events are claimed by batches with FOR UPDATE SKIP LOCKED so that
+        several cron workers can drain the queue concurrently, and every
+        batch is committed on its own. When events are left after ``limit``
+        ones, the cron reports its progress so that it runs again right away.
+        """
+        processed = 0
+        while processed < limit:
+            self.env.cr.execute("""
+                SELECT id FROM whatsapp_webhook_event
+                 WHERE state = 'new'
+              ORDER BY id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+            """, [min(batch_size, limit - processed)])
+            events = self.browse([row[0] for row in self.env.cr.fetchall()])
+            if not events:
+                break
+
+            conflict = events._process_events()
+            self.env.cr.commit()
+            if conflict:
+                raise conflict
+            processed += len(events)
+
+        self.env['ir.cron']._notify_progress(
+            done=processed,
+            remaining=self.search_count([('state', '=', 'new')]),
+        )
+
+    def _process_events(self):
+        """
+        Process a batch of claimed events, each in its own savepoint.
+
+        Processing stops at the first concurrency error, which is returned
+        so that the caller raises it once the events processed before are
+        committed; that event and the following ones stay queued.
+        """
+        notifications = []
+        done_events = self.browse()
+        conflict = None
+        for event in self:
+            try:
+                with self.env.cr.savepoint():
+                    event_notifications = event._process_payload(_loads(event.payload))
+                done_events |= event
+                notifications += event_notifications
+            except _CONCURRENCY_ERRORS as e:
+                conflict = e
+                break
+            except Exception as e:
+                _logger.error(f"WhatsApp webhook event {event.id} failed: {str(e)}", exc_info=True)
+                event.write({'state': 'error', 'error_message': str(e)})
+
+        # Mark all processed events at once, in a single UPDATE
+        done_events.write({'state': 'done'})
+
+        # One bus batch for the whole batch, only for events that were processed
+        self._send_notifications(notifications)
+        return conflict
+
+    @api.autovacuum
+    def _gc_events(self):
+        """Delete processed events older than a week and failed ones older than a month."""
+        now = fields.Datetime.now()
+        self.search([
+            '|',
+            '&', ('state', '=', 'done'), ('create_date', '<', now - timedelta(days=7)),
+            '&', ('state', '=', 'error'), ('create_date', '<', now - timedelta(days=30)),
+        ]).unlink()
+
+    def _process_payload(self, data):
+        """
+        Process a webhook payload.
+
+        Processes:
+        - Incoming messages
+        - Message status updates (sent, delivered, read)
+
+        :return: list of (channel, type, payload) bus notifications to send
+        """
+        # Normalize data structure to handle both standard and flattened payloads
+        entries = data.get('entry', [])
+
+        # If no 'entry' key, check if it looks like a flattened 'changes' object
+        if not entries and 'field' in data and 'value' in data:
+            entries = [{'changes': [data]}]
+
+        changes = [
+            change
+            for entry in entries
+            for change in entry.get('changes', [])
+            if change.get('field') == 'messages'
+        ]
+
+        # Resolve the accounts of all changes up front, keyed by phone_number_id
+        Account = self.env['whatsapp.account'].sudo()
+        phone_number_ids = {
+            change.get('value', {}).get('metadata', {}).get('phone_number_id')
+            for change in changes
+        }
+        accounts_by_pnid = {
+            phone_number_id: Account.browse(Account._get_id_by_phone_number_id(phone_number_id))
+            for phone_number_id in phone_number_ids
+            if phone_number_id
+        }
+        Message = self.env['whatsapp.message'].sudo()
+
+        notifications = []
+
+        # Process each change
+        for change in changes:
+            value = change.get('value', {})
+            phone_number_id = value.get('metadata', {}).get('phone_number_id')
+
+            if not phone_number_id:
+                continue
+
+            account = accounts_by_pnid[phone_number_id]
+            if not account:
+                _logger.warning(f"No account found for phone_number_id: {phone_number_id}")
+                continue
+
+            # Process messages in a single batch
+            messages = value.get('messages', [])
+            contacts = value.get('contacts', [])
+
+            msg_records = Message.process_webhook_messages(account, messages, contacts)
+            notifications += [
+                self._prepare_new_message_notification(account.id, msg_record)
+                for msg_record in msg_records
+            ]
+
+            # Process status updates in a single batch
+            statuses = value.get('statuses', [])
+
+            msg_records = Message.process_status_updates(account, statuses)
+            notifications += [
+                self._prepare_status_notification(account.id, msg_record)
+                for msg_record in msg_records
+            ]
+
+        return notifications
+
+    @api.model
+    def _prepare_new_message_notification(self, account_id, message):
+        """Build the bus notification for a new incoming message."""
+        channel = f'whatsapp_channel_{account_id}'
+        notification = {
+            'type': 'new_message',
+            'account_id': account_id,
+            'conversation_id': message.conversation_id.id if message.conversation_id else None,
+            'message': {
+                'id': message.id,
+                'direction': message.direction,
+                'content': message.content,
+                'message_type': message.message_type,
+                'timestamp': message.timestamp.isoformat() if message.timestamp else None,
+                'status': message.status,
+                'phone_number': message.phone_number,
+            }
+        }
+        return (channel, 'whatsapp.message', notification)
+
+    @api.model
+    def _prepare_status_notification(self, account_id, message):
+        """Build the bus notification for a message status update."""
+        channel = f'whatsapp_channel_{account_id}'
+        notification = {
+            'type': 'status_update',
+            'account_id': account_id,
+            'message_id': message.id,
+            'whatsapp_message_id': message.whatsapp_message_id,
+            'status': message.status,
+            'error_message': message.error_message,
+        }
+        return (channel, 'whatsapp.status', notification)
+
+    @api.model
+    def _send_notifications(self, notifications):
+        """
+        Send a batch of bus notifications once the transaction is committed.
+
+        The notifications are handed to a background dispatcher thread that
+        writes them to bus.bus with its own cursor, so the bus INSERT neither
+        runs nor holds locks in the transaction that stores the messages.
+        Nothing is sent if the transaction rolls back.
+        """
+        if not notifications:
+            return
+        self.env.cr.postcommit.add(
+            partial(_enqueue_bus_notifications, self.env.cr.dbname, notifications)
+        )
@@ -24,9 +24,11 @@ export class WhatsAppChat extends Component {
             conversations: [],
             activeConversation: null,
             messages: [],
+            nextBefore: null, // Cursor for loading older messages
             newMessage: "",
             loading: true, // Only true on initial load
             sendingMessage: false,
+            loadingOlder: false,
             showNewChatDialog: false,
             newChatPhone: "",
         });
@@ -166,18 +168,28 @@ export class WhatsAppChat extends Component {
         if (!this.state.activeConversation) return;
 
         try {
-            const messages = await this.orm.call(
+            const { messages, next_before } = await this.orm.call(
                 "whatsapp.conversation",
                 "get_messages",
                 [this.state.activeConversation.id]
             );
 
-            // Only update if there are new messages (compare length and last message id)
+            // Only update if there are new messages (compare last message id)
             const currentLastId = this.state.messages.length > 0 ? this.state.messages[this.state.messages.length - 1].id : null;
             const newLastId = messages.length > 0 ? messages[messages.length - 1].id : null;
 
-            if (messages.length !== this.state.messages.length || currentLastId !== newLastId) {
-                this.state.messages = messages;
+            if (currentLastId !== newLastId) {
+                const pageIds = new Set(messages.map(m => m.id));
+                if (this.state.messages.some(m => pageIds.has(m.id))) {
+                    // Keep older pages the user already loaded
+                    const olderMessages = this.state.messages.filter(m => !pageIds.has(m.id));
+                    this.state.messages = [...olderMessages, ...messages];
+                } else {
+                    // More messages arrived than a page holds: restart from the
+                    // newest page so that older ones load without gaps
+                    this.state.messages = messages;
+                    this.state.nextBefore = next_before;
+                }
                 setTimeout(() => this.scrollToBottom(), 100);
             }
         } catch (error) {
@@ -209,6 +221,7 @@ export class WhatsAppChat extends Component {
         this.state.selectedAccountId = accountId;
         this.state.activeConversation = null;
         this.state.messages = [];
+        this.state.nextBefore = null;
         await this.loadConversations(true); // Show loading when switching accounts
     }
 
@@ -268,12 +281,13 @@ export class WhatsAppChat extends Component {
         if (!this.state.activeConversation) return;
 
         try {
-            const messages = await this.orm.call(
+            const { messages, next_before } = await this.orm.call(
                 "whatsapp.conversation",
                 "get_messages",
                 [this.state.activeConversation.id]
             );
             this.state.messages = messages;
+            this.state.nextBefore = next_before;
             // Scroll to bottom after messages load
             setTimeout(() => this.scrollToBottom(), 100);
         } catch (error) {
@@ -282,6 +296,32 @@ export class WhatsAppChat extends Component {
         }
     }
 
+    async loadOlderMessages() {
+        if (!this.state.activeConversation || !this.state.nextBefore || this.state.loadingOlder) return;
+
+        const conversationId = this.state.activeConversation.id;
+        this.state.loadingOlder = true;
+        try {
+            const { messages, next_before } = await this.orm.call(
+                "whatsapp.conversation",
+                "get_messages",
+                [conversationId],
+                { before: this.state.nextBefore }
+            );
+            // Drop the page if another conversation was opened meanwhile
+            if (this.state.activeConversation && this.state.activeConversation.id === conversationId) {
+                const loadedIds = new Set(this.state.messages.map(m => m.id));
+                const olderMessages = messages.filter(m => !loadedIds.has(m.id));
+                this.state.messages = [...olderMessages, ...this.state.messages];
+                this.state.nextBefore = next_before;
+            }
+        } catch (error) {
+            this.notification.add(_t("Failed to load messages"), { type: "danger" });
+            console.error(error);
+        }
+        this.state.loadingOlder = false;
+    }
+
     scrollToBottom() {
         if (this.messagesEndRef.el) {
             this.messagesEndRef.el.scrollIntoView({ behavior: "smooth" });
@@ -38,8 +38,8 @@ class WhatsAppMessageSendWizard(models.TransientModel):
         if not self.phone_number:
             raise UserError("Please enter a phone number")
         
-        # Clean phone number
-        phone = self.phone_number.replace('+', '').replace(' ', '').replace('-', '')
+        # Clean phone number (digits only)
+        phone = self.env['whatsapp.conversation']._normalize_phone(self.phone_number)
         
         if self.message_type == 'text':
             if not self.message_text: